@@ -1,11 +1,40 @@
+import array
+import functools
 import os
+import shutil
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 import xml.etree.ElementTree as ET
-import re
 
-def create_ruleset_file(filename="pmd-ruleset.xml"):
-    """Creates the PMD ruleset XML file."""
-    content = """<?xml version="1.0" encoding="UTF-8"?>
+__all__ = [
+    "create_ruleset_file",
+    "run_pmd_command",
+    "count_lines_in_file",
+    "parse_and_summarize",
+]
+
+# Resolved once at import so repeated runs skip the PATH scan
+# (shutil.which honours PATHEXT, so this also finds pmd.bat on Windows)
+_PMD = shutil.which("pmd") or "pmd"
+
+# Source extensions PMD analyzes for Apex; only these are stat-ed up front
+_APEX_EXTENSIONS = (".cls", ".trigger")
+
+# Read size used when counting newlines in source files
+_READ_CHUNK_SIZE = 1 << 20
+
+# Namespace handling for PMD reports
+_NS = {'pmd': 'http://pmd.sourceforge.net/report/2.0.0'}
+_FILE_TAG = f"{{{_NS['pmd']}}}file"
+
+# Only CognitiveComplexity violations contribute to the summary
+_COMPLEXITY_VIOLATION_PATH = "pmd:violation[@rule='CognitiveComplexity']"
+
+# Phrase preceding the complexity number in a violation message
+_COMPLEXITY_PREFIX = "cognitive complexity of "
+
+# PMD ruleset written out by create_ruleset_file
+_RULESET_XML = """<?xml version="1.0" encoding="UTF-8"?>
 <ruleset name="Custom Apex Rules"
          xmlns="http://pmd.sourceforge.net/ruleset/2.0.0"
          xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
@@ -21,105 +50,196 @@ def create_ruleset_file(filename="pmd-ruleset.xml"):
 
 </ruleset>
 """
-    with open(filename, "w", encoding="utf-8") as f:
-        f.write(content)
+_RULESET_BYTES = _RULESET_XML.encode("utf-8")
+
+def create_ruleset_file(filename="pmd-ruleset.xml"):
+    """Creates the PMD ruleset XML file, leaving it untouched if already current."""
+    # Skip the write when nothing changed so the file's mtime stays stable
+    try:
+        with open(filename, "rb") as f:
+            if f.read() == _RULESET_BYTES:
+                print(f"{filename} is up to date")
+                return
+    except FileNotFoundError:
+        pass
+
+    with open(filename, "wb") as f:
+        f.write(_RULESET_BYTES)
     print(f"Created {filename}")
 
-def run_pmd_command(ruleset="pmd-ruleset.xml", report_file="pmd-report.xml", src_dir="./src"):
-    """Executes the PMD check command using PowerShell."""
-    command = [
-        "pmd", "check",
-        "--dir", src_dir,
+def _as_dir_list(src_dir):
+    """Returns src_dir as a list, accepting a single path or an iterable of paths."""
+    return [src_dir] if isinstance(src_dir, (str, os.PathLike)) else list(src_dir)
+
+def run_pmd_command(ruleset="pmd-ruleset.xml", report_file="pmd-report.xml", src_dir="./src", cache_file=".pmdcache"):
+    """Executes the PMD check command.
+
+    src_dir may be a single directory or a list of directories; all of them
+    are analyzed by one PMD run so the JVM only starts once. cache_file is
+    PMD's incremental analysis cache, so unchanged sources are skipped on
+    later runs.
+    """
+    src_dirs = _as_dir_list(src_dir)
+
+    command = [_PMD, "check"]
+    for directory in src_dirs:
+        command += ["--dir", os.fspath(directory)]
+    command += [
         "--rulesets", ruleset,
         "--format", "xml",
-        "--report-file", report_file
+        "--report-file", report_file,
+        "--cache", cache_file,
+        "--threads", str(os.cpu_count() or 2)
     ]
     
-    print(f"Executing PMD analysis on {src_dir}...")
+    print(f"Executing PMD analysis on {', '.join(map(os.fspath, src_dirs))}...")
     
     try:
-        # shell=True is often required on Windows to find the pmd command
-        subprocess.run(command, check=True, shell=True)
+        subprocess.run(command, check=True)
         print(f"Analysis complete. Report generated at {report_file}")
     except subprocess.CalledProcessError as e:
         if e.returncode > 0:
             print(f"PMD finished with violations (Exit code {e.returncode}). Proceeding to parsing.")
         else:
             print(f"Error running PMD: {e}")
+    except FileNotFoundError:
+        print("Error running PMD: 'pmd' executable not found on PATH.")
+
+@functools.lru_cache(maxsize=4096)
+def _count_lines_cached(normalized_path, mtime_ns):
+    """Counts lines in a file; keyed on mtime so edited files are re-read."""
+    # Count raw newline bytes; no need to decode the text just to count lines
+    line_count = 0
+    last_chunk = b""
+    with open(normalized_path, 'rb') as f:
+        chunk = f.read(_READ_CHUNK_SIZE)
+        while chunk:
+            line_count += chunk.count(b"\n")
+            last_chunk = chunk
+            chunk = f.read(_READ_CHUNK_SIZE)
+
+    # A final line without a trailing newline still counts as a line
+    if last_chunk and not last_chunk.endswith(b"\n"):
+        line_count += 1
+    return line_count
 
-def count_lines_in_file(filepath):
-    """Reads a file and returns the total number of lines."""
+def _scan_source_tree(src_dir):
+    """Walks src_dir (one directory or a list) once and returns a {normalized path: mtime_ns} map.
+
+    Only Apex sources are stat-ed. Keys are built from src_dir as given, so they
+    match report names only when PMD was run with the same --dir paths.
+    """
+    mtimes = {}
+    pending = _as_dir_list(src_dir)
+    while pending:
+        try:
+            with os.scandir(pending.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.name.lower().endswith(_APEX_EXTENSIONS) and entry.is_file():
+                        # DirEntry.stat() reuses the directory listing on Windows
+                        mtimes[os.path.normpath(entry.path)] = entry.stat().st_mtime_ns
+        except OSError:
+            continue
+    return mtimes
+
+def count_lines_in_file(filepath, mtimes=None):
+    """Reads a file and returns the total number of lines.
+
+    mtimes is an optional map from _scan_source_tree; paths found in it skip
+    the per-file stat call.
+    """
     try:
         # Normalize path separators for the OS
         normalized_path = os.path.normpath(filepath)
-        if not os.path.exists(normalized_path):
-            return 0 # Return 0 so we can sum safely
-            
-        with open(normalized_path, 'r', encoding='utf-8', errors='replace') as f:
-            return sum(1 for _ in f)
+        mtime_ns = mtimes.get(normalized_path) if mtimes else None
+        if mtime_ns is None:
+            mtime_ns = os.stat(normalized_path).st_mtime_ns
+
+        return _count_lines_cached(normalized_path, mtime_ns)
     except Exception:
-        return 0
+        return 0 # Return 0 so we can sum safely
+
+def parse_and_summarize(report_file="pmd-report.xml", output_file="complexity-summary.txt", src_dir=None):
+    """Parses the XML report, counts lines, and generates a text summary with totals.
 
-def parse_and_summarize(report_file="pmd-report.xml", output_file="complexity-summary.txt"):
-    """Parses the XML report, counts lines, and generates a text summary with totals."""
+    When src_dir (one directory or a list) is given, the source tree is scanned
+    once up front instead of stat-ing each reported file individually. Pass the
+    same paths given to run_pmd_command; report names that don't match fall back
+    to a per-file stat.
+    """
     if not os.path.exists(report_file):
         print(f"Error: {report_file} not found.")
         return
 
-    tree = ET.parse(report_file)
-    root = tree.getroot()
-    
-    # Namespace handling for PMD reports
-    ns = {'pmd': 'http://pmd.sourceforge.net/report/2.0.0'}
-    
-    # Dictionary to store data: filename -> {complexity, loc}
-    file_data = {}
+    # Per-file data kept in parallel containers, indexed by report order
+    filenames = []
+    complexities = array.array('q')
+    locs = array.array('q')
     
     # Grand totals
     grand_total_complexity = 0
     grand_total_loc = 0
 
-    # Regex to extract the complexity number
-    complexity_pattern = re.compile(r"cognitive complexity of (\d+)")
-
-    for file_elem in root.findall('pmd:file', ns):
+    # Stream the report so only one <file> element is held in memory at a time
+    for _, file_elem in ET.iterparse(report_file, events=("end",)):
+        if file_elem.tag != _FILE_TAG:
+            continue
         filename = file_elem.get('name')
         
         # 1. Calculate File Complexity
         file_complexity = 0
-        for violation in file_elem.findall('pmd:violation', ns):
-            rule = violation.get('rule')
-            if rule == 'CognitiveComplexity':
-                message = violation.text.strip() if violation.text else ""
-                match = complexity_pattern.search(message)
-                if match:
-                    file_complexity += int(match.group(1))
+        for violation in file_elem.iterfind(_COMPLEXITY_VIOLATION_PATH, _NS):
+            message = violation.text or ""
+            # Like re.search, take the first occurrence followed by digits
+            start = message.find(_COMPLEXITY_PREFIX)
+            while start >= 0:
+                start += len(_COMPLEXITY_PREFIX)
+                end = start
+                while end < len(message) and message[end].isdecimal():
+                    end += 1
+                if end > start:
+                    file_complexity += int(message[start:end])
+                    break
+                start = message.find(_COMPLEXITY_PREFIX, start)
         
-        # 2. Count File LOC
-        file_loc = count_lines_in_file(filename)
-
-        # Update totals
         grand_total_complexity += file_complexity
-        grand_total_loc += file_loc
 
-        file_data[filename] = {
-            "complexity": file_complexity,
-            "loc": file_loc
-        }
+        filenames.append(filename)
+        complexities.append(file_complexity)
+
+        # Free the parsed violations now that this file is summarized
+        file_elem.clear()
+
+    # 2. Count File LOC (IO-bound, so read the sources concurrently)
+    if filenames:
+        mtimes = _scan_source_tree(src_dir) if src_dir else None
+        count_lines = functools.partial(count_lines_in_file, mtimes=mtimes)
+        max_workers = min(32, (os.cpu_count() or 1) * 4, len(filenames))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            locs.extend(executor.map(count_lines, filenames))
+        grand_total_loc = sum(locs)
+
+    # Build the summary text in memory and write it out in one call
+    row_format = "{:<60} | {:<12} | {}\n"
+    separator = "-" * 95 + "\n"
+    lines = [
+        "Project Structure & Complexity Report\n",
+        "=====================================\n",
+        row_format.format("File Path", "Complexity", "Lines of Code"),
+        separator,
+    ]
+    order = sorted(range(len(filenames)), key=filenames.__getitem__)
+    lines.extend(
+        row_format.format(filenames[i], complexities[i], locs[i])
+        for i in order
+    )
+    lines.append(separator)
+    lines.append(row_format.format("GRAND TOTAL", grand_total_complexity, grand_total_loc))
 
-    # Write the summary text file
     with open(output_file, "w", encoding="utf-8") as f:
-        f.write("Project Structure & Complexity Report\n")
-        f.write("=====================================\n")
-        f.write(f"{'File Path':<60} | {'Complexity':<12} | {'Lines of Code'}\n")
-        f.write("-" * 95 + "\n")
-        
-        for filename in sorted(file_data.keys()):
-            data = file_data[filename]
-            f.write(f"{filename:<60} | {data['complexity']:<12} | {data['loc']}\n")
-            
-        f.write("-" * 95 + "\n")
-        f.write(f"{'GRAND TOTAL':<60} | {grand_total_complexity:<12} | {grand_total_loc}\n")
+        f.write("".join(lines))
             
     print(f"Summary generated at {output_file}")
 
@@ -128,10 +248,12 @@ if __name__ == "__main__":
     create_ruleset_file()
     
     # 2. Run the PMD command
-    if not os.path.exists("./src"):
+    src_dir = "./src"
+    if not os.path.exists(src_dir):
         print("Warning: './src' directory not found. Please ensure it exists before running.")
+        src_dir = None
     else:
-        run_pmd_command()
+        run_pmd_command(src_dir=src_dir)
         
     # 3. Parse and create text summary
-    parse_and_summarize()
\ No newline at end of file
+    parse_and_summarize(src_dir=src_dir)
\ No newline at end of file